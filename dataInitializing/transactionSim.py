@@ -1,167 +1,337 @@
-import json
-import random
+import os
 import uuid
 import time
 import datetime
-import math
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from botocore.config import Config
+import numpy as np
+from numpy.random import SFC64, default_rng
+import orjson
+from numba import njit
 
 # --- Configuration ---
 NUM_CARDS = 50
 NUM_TRANSACTIONS = 1000 # Adjust as needed
 OUTPUT_FILENAME = 'simulated_transactions.jsonl' # Define the output file name
+OUTPUT_BUFFER_SIZE = 1 << 16 # Bytes of JSON lines collected before each write to the output file
 FRAUD_INJECTION_PROBABILITY = 0.03
 COMPROMISE_CARD_PROBABILITY = 0.10
 AVG_TRANSACTION_DELAY_SECONDS = 0.1 # Decrease for faster file generation
+SIMULATE_DELAY = False # Sleep between transactions to mimic a live feed (slow)
 LOCATION_VARIATION_KM_NORMAL = 50
 LOCATION_VARIATION_KM_FRAUD = 5000
 NORMAL_AMOUNT_RANGE = (5.00, 250.00)
 FRAUD_AMOUNT_RANGE = (100.00, 2000.00)
 HIGH_VELOCITY_THRESHOLD_KMH = 800
+# Set to an int to reproduce the simulated values (cards, amounts, locations, fraud
+# flags, timing offsets); TransactionIDs and the start time still vary per run
+RANDOM_SEED = None
 
 # Optional: Kinesis Configuration
 KINESIS_STREAM_NAME = 'your-fraud-detection-stream'
 # ** SET TO FALSE IF YOU PRIMARILY WANT FILE OUTPUT **
 SEND_TO_KINESIS = False
+KINESIS_BATCH_SIZE = 500 # Records per put_records call (500 is the Kinesis maximum)
+KINESIS_MAX_RETRIES = 5 # Resends of records rejected by put_records (e.g. throttling)
+KINESIS_RETRY_BASE_SECONDS = 0.1 # First retry backoff, doubled on each attempt
+KINESIS_MAX_QUEUED = 10 * KINESIS_BATCH_SIZE # Unsent records kept after failures; oldest beyond this are dropped
+
+# Location radii folded into degrees of latitude once (1 degree ~ 111.1 km)
+_INV_111 = 1.0 / 111.1
+RADIUS_DEG_NORMAL = LOCATION_VARIATION_KM_NORMAL * _INV_111
+RADIUS_DEG_FRAUD_MIN = LOCATION_VARIATION_KM_NORMAL * 2 * _INV_111
+RADIUS_DEG_FRAUD_MAX = LOCATION_VARIATION_KM_FRAUD * _INV_111
+
+# One row per transaction, filled column by column after the sequential pass
+TRANSACTION_DTYPE = np.dtype([
+    ("TransactionID", "V16"),
+    ("CardIndex", "i8"),
+    ("Timestamp", "f8"),
+    ("Amount", "f8"),
+    ("MerchantIndex", "i8"),
+    ("MerchantLatitude", "f8"),
+    ("MerchantLongitude", "f8"),
+    ("IsFraud", "?"),
+    ("HomeLatitude", "f8"),
+    ("HomeLongitude", "f8"),
+])
+
+# Timestamps are passed to orjson as datetimes and emitted as 'YYYY-MM-DDTHH:MM:SSZ'
+JSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_OMIT_MICROSECONDS
 
 # --- Helper Functions ---
-# (Keep generate_location_around, haversine, generate_timestamp, send_to_kinesis - unchanged)
-def generate_location_around(lat, lon, max_distance_km):
-    """Generates a random coordinate within a certain distance (approximation)."""
-    radius_deg_lat = max_distance_km / 111.1
-    radius_deg_lon = max_distance_km / (111.1 * math.cos(math.radians(lat)))
-    delta_lat = random.uniform(-radius_deg_lat, radius_deg_lat)
-    delta_lon = random.uniform(-radius_deg_lon, radius_deg_lon)
-    new_lat = max(-90.0, min(90.0, lat + delta_lat))
-    new_lon = ((lon + delta_lon + 180) % 360) - 180
-    return round(new_lat, 6), round(new_lon, 6)
-
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate the great-circle distance between two points on the earth."""
+def haversine_vec(lat1, lon1, lat2, lon2):
+    """Vectorized haversine: great-circle distances between arrays of points."""
     R = 6371
-    dLat = math.radians(lat2 - lat1)
-    dLon = math.radians(lon2 - lon1)
-    lat1 = math.radians(lat1)
-    lat2 = math.radians(lat2)
-    a = math.sin(dLat / 2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dLon / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    distance = R * c
-    return distance
-
-def generate_timestamp(start_time, increment_seconds):
-    """Generates an increasing timestamp."""
-    return start_time + datetime.timedelta(seconds=increment_seconds)
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dLat = lat2 - lat1
+    dLon = np.radians(lon2 - lon1)
+    a = np.sin(dLat * 0.5)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dLon * 0.5)**2
+    return 2 * R * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+# Compiled eagerly for this exact signature and cached on disk, so runs after the
+# first load native code instead of re-JITing; error_model="numpy" drops the
+# ZeroDivisionError checks (every division here has a guarded or constant divisor).
+@njit(
+    "float64[::1](int64[::1], boolean[::1], float64[::1], float64[::1], boolean[::1],"
+    " float64[::1], float64[::1], float64)",
+    cache=True,
+    error_model="numpy",
+)
+def simulate_timestamps(card_idx, is_fraud, hop_km, time_increments, force_velocity,
+                        short_delay_fraction, last_ts, start_ts):
+    """Sequential timestamp pass, in float epoch seconds starting from start_ts.
+
+    last_ts holds each card's previous timestamp (NaN if none) and is updated in place.
+    """
+    n = card_idx.shape[0]
+    ts_out = np.empty(n, dtype=np.float64)
+    current = start_ts
+    for i in range(n):
+        card = card_idx[i]
+        if is_fraud[i]:
+            # Optional velocity check/forcing (Logic unchanged)
+            last = last_ts[card]
+            if not np.isnan(last):
+                time_delta_seconds = current - last
+                if time_delta_seconds > 0:
+                    velocity_kmh = (hop_km[i] / time_delta_seconds) * 3600
+                    if velocity_kmh < HIGH_VELOCITY_THRESHOLD_KMH and force_velocity[i]:
+                        required_time_seconds = (hop_km[i] / HIGH_VELOCITY_THRESHOLD_KMH) * 3600
+                        current = last + max(1.0, required_time_seconds * short_delay_fraction[i])
+                else:
+                    current += time_increments[i]
+        else:
+            current += time_increments[i]
+        ts_out[i] = current
+        # --- Update card state --- (Logic unchanged)
+        last_ts[card] = current
+    return ts_out
+
+# Created once at load; only needed (and only configured) when sending to Kinesis
+_KINESIS = boto3.client(
+    'kinesis',
+    config=Config(max_pool_connections=16, retries={"mode": "adaptive"})
+) if SEND_TO_KINESIS else None
+_kinesis_batch = []
+# Queue length that triggers the next flush; after a failed flush this waits for a
+# fresh full batch, so a persistent error costs one retry cycle per batch, not per record
+_kinesis_flush_at = KINESIS_BATCH_SIZE
 
 def send_to_kinesis(data_record, stream_name, partition_key):
-    """Sends a single data record to Kinesis."""
-    try:
-        kinesis_client = boto3.client('kinesis')
-        response = kinesis_client.put_record(
-            StreamName=stream_name,
-            Data=json.dumps(data_record),
-            PartitionKey=partition_key
-        )
-        return True
-    except Exception as e:
-        print(f"Error sending to Kinesis: {e}")
-        return False
+    """Queues a data record for Kinesis, sending once a full new batch has built up."""
+    _kinesis_batch.append({
+        "Data": orjson.dumps(data_record, option=JSON_OPTIONS),
+        "PartitionKey": partition_key
+    })
+    if len(_kinesis_batch) >= _kinesis_flush_at:
+        return flush_kinesis(stream_name)
+    return True
+
+def flush_kinesis(stream_name):
+    """Sends queued records to Kinesis with put_records, resending rejected ones.
+
+    Records that still fail after KINESIS_MAX_RETRIES stay queued for the next flush,
+    up to KINESIS_MAX_QUEUED; older records beyond that are dropped and reported.
+    """
+    global _kinesis_flush_at
+    while _kinesis_batch:
+        records = _kinesis_batch[:KINESIS_BATCH_SIZE]
+        for attempt in range(KINESIS_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(KINESIS_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+            try:
+                response = _KINESIS.put_records(StreamName=stream_name, Records=records)
+            except Exception as e:
+                print(f"Error sending to Kinesis: {e}")
+                continue
+            # Keep only the entries Kinesis rejected; results are in request order
+            records = [
+                record for record, result in zip(records, response["Records"])
+                if "ErrorCode" in result
+            ]
+            if not records:
+                break
+        # Drop the sent records from the queue, leaving any failures at the front
+        _kinesis_batch[:KINESIS_BATCH_SIZE] = records
+        if records:
+            print(f"Kinesis rejected {len(records)} records after {KINESIS_MAX_RETRIES} retries; keeping them queued")
+            overflow = len(_kinesis_batch) - KINESIS_MAX_QUEUED
+            if overflow > 0:
+                del _kinesis_batch[:overflow]
+                print(f"Kinesis queue full; dropped the {overflow} oldest unsent records")
+            _kinesis_flush_at = len(_kinesis_batch) + KINESIS_BATCH_SIZE
+            return False
+    _kinesis_flush_at = KINESIS_BATCH_SIZE
+    return True
+
+def write_paced(outfile, chunk, delays):
+    """Waits out the next simulated delay, then writes and flushes one record."""
+    time.sleep(next(delays))
+    outfile.write(chunk)
+    outfile.flush()
 
 # --- Main Simulation ---
 
+rng = default_rng(SFC64(RANDOM_SEED))
+
 print("Initializing card data...")
-cards_data = {}
-for i in range(NUM_CARDS):
-    card_id = f"CARD_{i:04d}"
-    home_lat = random.uniform(25.0, 65.0)
-    home_lon = random.uniform(-125.0, 40.0)
-    cards_data[card_id] = {
-        "HomeLatitude": round(home_lat, 6),
-        "HomeLongitude": round(home_lon, 6),
-        "IsCompromised": random.random() < COMPROMISE_CARD_PROBABILITY,
-        "LastTxTimestamp": None,
-        "LastTxLatitude": None,
-        "LastTxLongitude": None,
-    }
-
-print(f"Generated {len(cards_data)} cards.")
+# Per-card state as parallel arrays indexed by the integer card number
+card_ids = [f"CARD_{i:04d}" for i in range(NUM_CARDS)]
+home_lat = rng.uniform(25.0, 65.0, size=NUM_CARDS)
+home_lon = rng.uniform(-125.0, 40.0, size=NUM_CARDS)
+is_compromised = rng.random(NUM_CARDS) < COMPROMISE_CARD_PROBABILITY
+# 1 / cos(home latitude) scales the longitude radius; cos is floored so it stays finite at the poles
+home_inv_cos_lat = 1.0 / np.maximum(np.cos(np.radians(home_lat)), 1e-6)
+last_ts = np.full(NUM_CARDS, np.nan)
+
+print(f"Generated {NUM_CARDS} cards.")
 print(f"Starting transaction simulation, writing to '{OUTPUT_FILENAME}'...")
 
-current_time = datetime.datetime.now(datetime.timezone.utc)
+# --- Batch Generation ---
+# Every random input is drawn up front, one array per field. Only the
+# timestamps depend on per-card state, so they get a sequential pass below.
+card_idx = rng.integers(0, NUM_CARDS, size=NUM_TRANSACTIONS)
+tx_home_lat = home_lat[card_idx]
+tx_home_lon = home_lon[card_idx]
+
+# Determine which transactions are fraudulent (Logic unchanged)
+is_fraud = is_compromised[card_idx] & (rng.random(NUM_TRANSACTIONS) < FRAUD_INJECTION_PROBABILITY)
+
+amounts = np.where(
+    is_fraud,
+    rng.uniform(*FRAUD_AMOUNT_RANGE, size=NUM_TRANSACTIONS),
+    rng.uniform(*NORMAL_AMOUNT_RANGE, size=NUM_TRANSACTIONS)
+).round(2) # Whole cents; one vectorized round over the column
+
+# Merchant location around the card's home (approximation)
+radius_deg_lat = np.where(
+    is_fraud,
+    rng.uniform(RADIUS_DEG_FRAUD_MIN, RADIUS_DEG_FRAUD_MAX, size=NUM_TRANSACTIONS),
+    rng.uniform(0, RADIUS_DEG_NORMAL, size=NUM_TRANSACTIONS)
+)
+radius_deg_lon = radius_deg_lat * home_inv_cos_lat[card_idx]
+# Offsets are built, clamped and wrapped in place (no per-step temporaries)
+merchant_lat = rng.uniform(-1.0, 1.0, size=NUM_TRANSACTIONS)
+merchant_lat *= radius_deg_lat
+merchant_lat += tx_home_lat
+np.clip(merchant_lat, -90.0, 90.0, out=merchant_lat)
+merchant_lon = rng.uniform(-1.0, 1.0, size=NUM_TRANSACTIONS)
+merchant_lon *= radius_deg_lon
+merchant_lon += tx_home_lon
+merchant_lon += 180.0
+np.mod(merchant_lon, 360.0, out=merchant_lon)
+merchant_lon -= 180.0
+
+# Distance from each card's previous merchant to the current one. Merchant
+# locations don't depend on time, so these hops are known up front; only the
+# fraud rows feed the velocity check.
+order = np.argsort(card_idx, kind='stable')
+same_card = card_idx[order[1:]] == card_idx[order[:-1]]
+prev_idx = np.full(NUM_TRANSACTIONS, -1)
+prev_idx[order[1:][same_card]] = order[:-1][same_card]
+hop_km = np.full(NUM_TRANSACTIONS, np.nan)
+has_hop = is_fraud & (prev_idx >= 0)
+hop_km[has_hop] = haversine_vec(
+    merchant_lat[prev_idx[has_hop]], merchant_lon[prev_idx[has_hop]],
+    merchant_lat[has_hop], merchant_lon[has_hop]
+)
+
+# Identifiers: one urandom read for every TransactionID, merchants picked in one draw
+# from a table of MerchantID strings built once (MERCHANT_1000 .. MERCHANT_9999)
+uuid_bytes = os.urandom(16 * NUM_TRANSACTIONS)
+merchant_ids = [f"MERCHANT_{n}" for n in range(1000, 10000)]
+merchant_idx = rng.integers(0, len(merchant_ids), size=NUM_TRANSACTIONS)
+
+# Inputs for the timestamp pass
+time_increments = rng.exponential(AVG_TRANSACTION_DELAY_SECONDS, size=NUM_TRANSACTIONS)
+force_velocity = rng.random(NUM_TRANSACTIONS) < 0.5
+short_delay_fraction = rng.uniform(0.5, 0.9, size=NUM_TRANSACTIONS)
+
+# Real-time pacing, resolved once here: with SIMULATE_DELAY off nothing is drawn
+# and output is written in large chunks. With it on, each record is handed to the
+# writer on its own and flushed to the file after its delay (see write_paced).
+if SIMULATE_DELAY:
+    delays = iter(np.clip(
+        rng.normal(AVG_TRANSACTION_DELAY_SECONDS, AVG_TRANSACTION_DELAY_SECONDS / 3, size=NUM_TRANSACTIONS),
+        0.01, None
+    ).tolist())
+    flush_threshold = 1
+else:
+    flush_threshold = OUTPUT_BUFFER_SIZE
+
+# --- Sequential Pass: timestamps and card state ---
+start_ts = time.time()
+timestamps = simulate_timestamps(
+    card_idx, is_fraud, hop_km, time_increments, force_velocity,
+    short_delay_fraction, last_ts, start_ts
+)
+
+transactions = np.empty(NUM_TRANSACTIONS, dtype=TRANSACTION_DTYPE)
+transactions["TransactionID"] = np.frombuffer(uuid_bytes, dtype="V16")
+transactions["CardIndex"] = card_idx
+transactions["Timestamp"] = timestamps
+transactions["Amount"] = amounts
+transactions["MerchantIndex"] = merchant_idx
+transactions["MerchantLatitude"] = merchant_lat
+transactions["MerchantLongitude"] = merchant_lon
+transactions["IsFraud"] = is_fraud
+transactions["HomeLatitude"] = tx_home_lat
+transactions["HomeLongitude"] = tx_home_lon
+
 transactions_generated = 0
 
-# Open the output file in write mode ('w')
+# JSON lines accumulate here and go to the file in flush_threshold chunks.
+# orjson holds the GIL, so encoding stays on this thread; the file writes (which
+# release it) run on a single writer thread so the next chunk is encoded while
+# the previous one is written. One worker keeps the chunks in order.
+out_buffer = bytearray()
+pending_write = None
+
+# Open the output file in binary write mode ('wb')
 # Using 'with' ensures the file is properly closed even if errors occur
-with open(OUTPUT_FILENAME, 'w') as outfile:
-    for i in range(NUM_TRANSACTIONS):
-        card_id = random.choice(list(cards_data.keys()))
-        card_info = cards_data[card_id]
-
-        is_fraud = False
-        amount = 0.0
-        merchant_lat = 0.0
-        merchant_lon = 0.0
-
-        # Determine if this transaction is fraudulent (Logic unchanged)
-        if card_info["IsCompromised"] and random.random() < FRAUD_INJECTION_PROBABILITY:
-            is_fraud = True
-            amount = round(random.uniform(*FRAUD_AMOUNT_RANGE), 2)
-            merchant_lat, merchant_lon = generate_location_around(
-                card_info["HomeLatitude"],
-                card_info["HomeLongitude"],
-                random.uniform(LOCATION_VARIATION_KM_NORMAL * 2, LOCATION_VARIATION_KM_FRAUD)
-            )
-            # Optional velocity check/forcing (Logic unchanged)
-            if card_info["LastTxTimestamp"] and card_info["LastTxLatitude"]:
-                 time_delta_seconds = (current_time - card_info["LastTxTimestamp"]).total_seconds()
-                 if time_delta_seconds > 0:
-                     distance_km = haversine(
-                         card_info["LastTxLatitude"], card_info["LastTxLongitude"],
-                         merchant_lat, merchant_lon
-                     )
-                     velocity_kmh = (distance_km / time_delta_seconds) * 3600
-                     if velocity_kmh < HIGH_VELOCITY_THRESHOLD_KMH and random.random() < 0.5:
-                          required_time_seconds = (distance_km / HIGH_VELOCITY_THRESHOLD_KMH) * 3600
-                          simulated_short_delay = max(1, random.uniform(required_time_seconds * 0.5, required_time_seconds * 0.9))
-                          current_time = card_info["LastTxTimestamp"] + datetime.timedelta(seconds=simulated_short_delay)
-                 else:
-                     time_increment = random.expovariate(1.0 / AVG_TRANSACTION_DELAY_SECONDS)
-                     current_time = generate_timestamp(current_time, time_increment)
-
-        else: # Normal transaction (Logic unchanged)
-            is_fraud = False
-            amount = round(random.uniform(*NORMAL_AMOUNT_RANGE), 2)
-            merchant_lat, merchant_lon = generate_location_around(
-                card_info["HomeLatitude"],
-                card_info["HomeLongitude"],
-                random.uniform(0, LOCATION_VARIATION_KM_NORMAL)
-            )
-            time_increment = random.expovariate(1.0 / AVG_TRANSACTION_DELAY_SECONDS)
-            current_time = generate_timestamp(current_time, time_increment)
-
-
-        transaction_id = str(uuid.uuid4())
-        merchant_id = f"MERCHANT_{random.randint(1000, 9999)}"
+with open(OUTPUT_FILENAME, 'wb') as outfile, ThreadPoolExecutor(max_workers=1) as writer:
+    # Chosen once, so the emit loop itself never checks SIMULATE_DELAY. Waiting on
+    # each paced write before submitting the next keeps generation one record ahead.
+    if SIMULATE_DELAY:
+        write_chunk = functools.partial(write_paced, outfile, delays=delays)
+    else:
+        write_chunk = outfile.write
+
+    # tolist() turns the whole table into tuples of plain Python values in one call
+    for (raw_id, card, ts, amount, merchant, tx_merchant_lat, tx_merchant_lon,
+         tx_is_fraud, row_home_lat, row_home_lon) in transactions.tolist():
+        card_id = card_ids[card]
+
+        transaction_id = uuid.UUID(bytes=raw_id, version=4)
+        merchant_id = merchant_ids[merchant]
+        tx_time = datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
 
         # Create the transaction record (Schema unchanged)
         transaction_data = {
             "TransactionID": transaction_id,
             "CardID": card_id,
-            "Timestamp": current_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "Timestamp": tx_time,
             "Amount": amount,
             "MerchantID": merchant_id,
-            "MerchantLatitude": merchant_lat,
-            "MerchantLongitude": merchant_lon,
-            "IsFraud": is_fraud,
-            "HomeLatitude": card_info["HomeLatitude"],
-            "HomeLongitude": card_info["HomeLongitude"]
+            "MerchantLatitude": tx_merchant_lat,
+            "MerchantLongitude": tx_merchant_lon,
+            "IsFraud": tx_is_fraud,
+            "HomeLatitude": row_home_lat,
+            "HomeLongitude": row_home_lon
         }
 
         # --- Output ---
-        # Convert the dictionary to a JSON string
-        json_output = json.dumps(transaction_data)
-
-        # Write the JSON string to the file, followed by a newline character
-        outfile.write(json_output + '\n')
+        # Serialize the dictionary to JSON bytes, followed by a newline character
+        out_buffer += orjson.dumps(transaction_data, option=JSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        if len(out_buffer) >= flush_threshold:
+            if pending_write is not None:
+                pending_write.result() # At most one chunk in flight; surfaces write errors
+            pending_write = writer.submit(write_chunk, out_buffer)
+            out_buffer = bytearray()
 
         transactions_generated += 1
         # Optional: Print progress to console
@@ -172,19 +342,18 @@ with open(OUTPUT_FILENAME, 'w') as outfile:
         # Optional: Send to Kinesis
         if SEND_TO_KINESIS:
             if not send_to_kinesis(transaction_data, KINESIS_STREAM_NAME, card_id):
-                 print(f"Failed to send TXN {transaction_id} to Kinesis. Stopping.")
+                 print(f"Failed to send Kinesis batch ending at TXN {transaction_id}. Stopping.")
                  # break # Optional: Stop if Kinesis fails
 
-        # --- Update card state --- (Logic unchanged)
-        card_info["LastTxTimestamp"] = current_time
-        card_info["LastTxLatitude"] = merchant_lat
-        card_info["LastTxLongitude"] = merchant_lon
-
-        # --- Simulate Delay --- (Optional, can be removed for faster file writing)
-        # delay = max(0.01, random.gauss(AVG_TRANSACTION_DELAY_SECONDS, AVG_TRANSACTION_DELAY_SECONDS / 3))
-        # time.sleep(delay)
+    if pending_write is not None:
+        pending_write.result()
+    outfile.write(out_buffer)
 
 # End of the 'with open...' block, file is automatically closed here
 
+# Send whatever is left in the last partial Kinesis batch
+if SEND_TO_KINESIS and not flush_kinesis(KINESIS_STREAM_NAME):
+    print(f"Failed to send the final Kinesis batch; {len(_kinesis_batch)} records were not sent.")
+
 print(f"\nFinished generating {transactions_generated} transactions.")
 print(f"Data saved to '{OUTPUT_FILENAME}'")